@@ -1,13 +1,42 @@
 import hashlib
 import json
-from time import time
-from typing import List, Dict, Any
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from time import time, perf_counter
+from typing import List, Dict, Any, Tuple
+
+MINING_BATCH = 20_000  # Nonces per task of the parallel miner
+STOP_CHECK_INTERVAL = 1000  # Nonces a worker tries between looks at the shared best nonce
+DIFFICULTY_BITS = 16  # Leading zero bits of a valid proof hash, 4 hex zeroes
+MAX_TARGET = 1 << 256  # Every hash is below it, difficulty 0
+DEFAULT_TARGET = 1 << (256 - DIFFICULTY_BITS)
+RETARGET_INTERVAL = 10  # Blocks between difficulty adjustments
+MAX_RETARGET_FACTOR = 4  # Largest change of the target in one adjustment
+NONCE_SUFFIXES = [b'%03d' % low for low in range(1000)]  # Last three digits of nonces >= 1000
+SMALL_NONCES = [str(nonce).encode() for nonce in range(1000)]
+
+best_nonce = None  # Shared multiprocessing.Value of the smallest valid nonce found so far, set in each worker
 
 
 class Blockchain:
-    def __init__(self):
+    def __init__(self, difficulty_bits: float = DIFFICULTY_BITS, target: int = None, target_block_time: float = None,
+                 retarget_interval: int = RETARGET_INTERVAL):
+        """
+        Args:
+            difficulty_bits (float): Leading zero bits a proof hash needs, fractional values are allowed.
+            target (int): Numeric target the proof hash must be below, overrides `difficulty_bits`.
+            target_block_time (float): Seconds wanted between blocks. When set, the target is adjusted
+                every `retarget_interval` blocks from the observed block times.
+            retarget_interval (int): Blocks between adjustments.
+        """
         self.chain: List[Dict[str, Any]] = []
         self.current_transactions: List[Dict[str, Any]] = []
+        self.mining_stats: Dict[str, Any] = {}
+        self.target = target if target is not None else difficulty_target(difficulty_bits)
+        self.target_block_time = target_block_time
+        self.retarget_interval = retarget_interval
 
         # Create the genesis block
         self.new_block(previous_hash='1', proof=100)
@@ -28,6 +57,7 @@ class Blockchain:
             'timestamp': time(),
             'transactions': self.current_transactions,
             'proof': proof,
+            'target': self.target,
             'previous_hash': previous_hash or self.hash(self.chain[-1]),
         }
 
@@ -35,8 +65,31 @@ class Blockchain:
         self.current_transactions = []
 
         self.chain.append(block)
+        if self.target_block_time and len(self.chain) > self.retarget_interval \
+                and (len(self.chain) - 1) % self.retarget_interval == 0:
+            self.retarget()
         return block
 
+    def retarget(self) -> int:
+        """
+        Adjusts the target so blocks are mined every `target_block_time` seconds.
+
+        The target is scaled by the ratio of the observed to the wanted time of the last `retarget_interval`
+        blocks, limited to MAX_RETARGET_FACTOR either way: slow blocks raise it, fast blocks lower it.
+
+        Returns:
+            int: The new target.
+        """
+        observed = self.chain[-1]['timestamp'] - self.chain[-1 - self.retarget_interval]['timestamp']
+        expected = self.retarget_interval * self.target_block_time
+        ratio = min(max(observed / expected, 1 / MAX_RETARGET_FACTOR), MAX_RETARGET_FACTOR)
+        self.target = max(1, min(int(self.target * ratio), MAX_TARGET))
+        return self.target
+
+    @property
+    def difficulty_bits(self) -> float:
+        return 256 - math.log2(self.target)
+
     def new_transaction(self, sender: str, recipient: str, amount: int) -> int:
         """
         Create a new transaction to go into the next mined Block.
@@ -78,7 +131,8 @@ class Blockchain:
     def proof_of_work(self, last_proof: int) -> int:
         """
         Simple Proof of Work Algorithm:
-        - Find a number p' such that hash(pp') contains leading 4 zeroes, where p is the previous p'.
+        - Find a number p' such that hash(pp') is below the target (4 leading hex zeroes by default),
+          where p is the previous p'.
         - p is the previous proof, and p' is the new proof.
 
         Args:
@@ -87,26 +141,238 @@ class Blockchain:
         Returns:
             int: New Proof.
         """
-        proof = 0
-        while self.valid_proof(last_proof, proof) is False:
-            proof += 1
+        start = 0
+        while True:
+            proof = find_proof(last_proof, start, start + MINING_BATCH, self.target)
+            if proof >= 0:
+                return proof
+            start += MINING_BATCH
+
+    def proof_of_work_parallel(self, last_proof: int, workers: int = None, batch_size: int = MINING_BATCH) -> int:
+        """
+        Multi-core Proof of Work, returns the same proof as proof_of_work.
+
+        The nonce space is split in batches of `batch_size` handed to the workers in order, so each round
+        of batches is strided across the pool. Once a valid proof is found, workers abandon nonces above
+        it while batches below it are searched to the end, so the smallest valid nonce wins.
+        Hash rates of the run are kept in `self.mining_stats`.
+
+        Args:
+            last_proof (int): Previous Proof.
+            workers (int): Number of worker processes, the CPU count by default.
+            batch_size (int): Nonces per task.
+
+        Returns:
+            int: New Proof.
+        """
+        proof, self.mining_stats = mine_parallel(last_proof, workers, batch_size, self.target)
         return proof
 
     @staticmethod
-    def valid_proof(last_proof: int, proof: int) -> bool:
+    def valid_proof(last_proof: int, proof: int, target: int = DEFAULT_TARGET) -> bool:
         """
-        Validates the Proof: Does hash(last_proof, proof) contain 4 leading zeroes?
+        Validates the Proof: Is hash(last_proof, proof) below the target (4 leading zeroes by default)?
 
         Args:
             last_proof (int): Previous Proof.
             proof (int): Current Proof.
+            target (int): Numeric target, a block records the target it was mined with.
 
         Returns:
             bool: True if correct, False if not.
         """
         guess = f'{last_proof}{proof}'.encode()
         guess_hash = hashlib.sha256(guess).hexdigest()
-        return guess_hash[:4] == "0000"
+        return int(guess_hash, 16) < target
+
+
+def difficulty_target(bits: float) -> int:
+    """
+    Converts a difficulty in leading zero bits to the numeric target.
+
+    A SHA-256 hash has at least `bits` leading zero bits exactly when, read as a number, it is below
+    2 ** (256 - bits). Fractional bits give the targets in between.
+
+    Args:
+        bits (float): Leading zero bits, between 0 and 256.
+
+    Returns:
+        int: The target.
+    """
+    if bits == int(bits):
+        return 1 << (256 - int(bits))
+    return max(1, int(2 ** (256 - bits)))
+
+
+def target_bytes(target: int) -> bytes:
+    """
+    Encodes a target so raw digests can be compared with it directly.
+
+    Digests and the encoded target have the same length, so comparing the big-endian bytes compares the numbers.
+
+    Args:
+        target (int): Numeric target.
+
+    Returns:
+        bytes: The target, valid digests compare lower.
+    """
+    if target >= MAX_TARGET:
+        return b'\xff' * 33  # Longer than any digest, so every digest compares lower
+    return target.to_bytes(32, 'big')
+
+
+def find_proof(last_proof: int, start: int, stop: int, target: int = DEFAULT_TARGET) -> int:
+    """
+    Finds the smallest valid proof in [start, stop), equivalent to calling valid_proof on every nonce.
+
+    The hash state after `last_proof` is computed once and copied for every nonce. Nonces from 1000 on
+    are hashed as their leading digits, fed once per thousand, followed by one of the precomputed
+    three-digit suffixes. Raw digests are compared with the difficulty target instead of hex strings.
+
+    Args:
+        last_proof (int): Previous Proof.
+        start (int): First nonce to try.
+        stop (int): End of the range (exclusive).
+        target (int): Numeric target the proof hash must be below.
+
+    Returns:
+        int: The proof, or -1 if the range holds none.
+    """
+    target = target_bytes(target)
+    base = hashlib.sha256(str(last_proof).encode())
+    proof = start
+    while proof < min(stop, 1000):
+        guess = base.copy()
+        guess.update(SMALL_NONCES[proof])
+        if guess.digest() < target:
+            return proof
+        proof += 1
+
+    while proof < stop:
+        high, low = divmod(proof, 1000)
+        prefix = base.copy()
+        prefix.update(str(high).encode())
+        copy = prefix.copy
+        for low in range(low, min(stop - high * 1000, 1000)):
+            guess = copy()
+            guess.update(NONCE_SUFFIXES[low])
+            if guess.digest() < target:
+                return high * 1000 + low
+        proof = (high + 1) * 1000
+    return -1
+
+
+def benchmark_proof_search(last_proof: int = 100, count: int = 200_000) -> Dict[str, float]:
+    """
+    Compares the hash rate of valid_proof with the optimized find_proof on the same nonces.
+
+    Args:
+        last_proof (int): Previous Proof.
+        count (int): Number of nonces hashed by each method.
+
+    Returns:
+        dict: Hashes per second of both methods and the speedup.
+    """
+    target = 1  # Only an all-zero hash is below it, so both methods hash every nonce
+    started = perf_counter()
+    for proof in range(count):
+        Blockchain.valid_proof(last_proof, proof, target)
+    original = count / (perf_counter() - started)
+
+    started = perf_counter()
+    find_proof(last_proof, 0, count, target)
+    optimized = count / (perf_counter() - started)
+    return {'valid_proof': original, 'find_proof': optimized, 'speedup': optimized / original}
+
+
+def init_worker(shared_best) -> None:
+    global best_nonce
+    best_nonce = shared_best
+
+
+def search_range(last_proof: int, start: int, stop: int, target: int) -> Tuple[int, int, int, float]:
+    """
+    Searches nonces in [start, stop) for a valid proof, runs in a worker of mine_parallel.
+
+    Args:
+        last_proof (int): Previous Proof.
+        start (int): First nonce to try.
+        stop (int): End of the range (exclusive).
+        target (int): Numeric target the proof hash must be below.
+
+    Returns:
+        tuple: The valid nonce (-1 if none was found), the number of hashes computed, the worker pid
+        and the seconds spent.
+    """
+    started = perf_counter()
+    found = -1
+    proof = start
+    while proof < stop:
+        best = best_nonce.value
+        if 0 <= best < proof:
+            break  # A smaller valid nonce exists, nothing left here can win
+        chunk_end = min(proof + STOP_CHECK_INTERVAL, stop)
+        found = find_proof(last_proof, proof, chunk_end, target)
+        if found < 0:
+            proof = chunk_end
+            continue
+        with best_nonce.get_lock():
+            if best_nonce.value < 0 or found < best_nonce.value:
+                best_nonce.value = found
+        break
+    hashes = (found if found >= 0 else proof) - start + (found >= 0)
+    return found, hashes, os.getpid(), perf_counter() - started
+
+
+def mine_parallel(last_proof: int, workers: int = None, batch_size: int = MINING_BATCH,
+                  target: int = DEFAULT_TARGET) -> Tuple[int, Dict[str, Any]]:
+    """
+    Finds the smallest valid proof with a pool of worker processes.
+
+    Args:
+        last_proof (int): Previous Proof.
+        workers (int): Number of worker processes, the CPU count by default.
+        batch_size (int): Nonces per task.
+        target (int): Numeric target the proof hash must be below.
+
+    Returns:
+        tuple: The proof and the hash rate statistics (per worker pid and in total).
+    """
+    workers = workers or os.cpu_count() or 1
+    shared_best = multiprocessing.Value('q', -1)
+    per_worker = {}
+    found = []
+    started = perf_counter()
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(shared_best,)) as executor:
+        pending = set()
+        next_start = 0
+        while True:
+            # Keep two batches per worker queued, handed out in nonce order, until a proof is found
+            while not found and len(pending) < 2 * workers:
+                pending.add(executor.submit(search_range, last_proof, next_start, next_start + batch_size, target))
+                next_start += batch_size
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                nonce, hashes, pid, seconds = future.result()
+                worker = per_worker.setdefault(pid, {'hashes': 0, 'seconds': 0.0})
+                worker['hashes'] += hashes
+                worker['seconds'] += seconds
+                if nonce >= 0:
+                    found.append(nonce)
+    elapsed = perf_counter() - started
+
+    for worker in per_worker.values():
+        worker['hashes_per_sec'] = worker['hashes'] / worker['seconds'] if worker['seconds'] else 0.0
+    total = sum(worker['hashes'] for worker in per_worker.values())
+    stats = {
+        'workers': per_worker,
+        'hashes': total,
+        'seconds': elapsed,
+        'hashes_per_sec': total / elapsed if elapsed else 0.0,
+    }
+    return min(found), stats
 
 
 def main():
@@ -123,6 +389,25 @@ def main():
 
     print("Blockchain:", blockchain.chain)
 
+    parallel_proof = blockchain.proof_of_work_parallel(last_proof)
+    assert parallel_proof == proof
+    for pid, worker in blockchain.mining_stats['workers'].items():
+        print(f"Worker {pid}: {worker['hashes']} hashes, {worker['hashes_per_sec']:,.0f} hashes/s")
+    print(f"Total: {blockchain.mining_stats['hashes']} hashes, "
+          f"{blockchain.mining_stats['hashes_per_sec']:,.0f} hashes/s")
+
+    rates = benchmark_proof_search(last_proof)
+    print(f"valid_proof: {rates['valid_proof']:,.0f} hashes/s, find_proof: {rates['find_proof']:,.0f} hashes/s "
+          f"({rates['speedup']:.2f}x)")
+
+    # Retarget from 12 bits towards one block every 20 ms
+    adaptive = Blockchain(difficulty_bits=12, target_block_time=0.02, retarget_interval=5)
+    for _ in range(30):
+        started = time()
+        adaptive.new_block(adaptive.proof_of_work(adaptive.last_block['proof']))
+        print(f"Block {adaptive.last_block['index']}: {time() - started:.3f} s, "
+              f"difficulty {adaptive.difficulty_bits:.2f} bits")
+
 
 if __name__ == "__main__":
     main()
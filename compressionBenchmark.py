@@ -0,0 +1,386 @@
+import argparse
+import json
+import math
+import random
+import sys
+import tracemalloc
+from collections import Counter
+from io import BytesIO
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+from dataCompression import (rle_compress, huffman_setup, huffman_compress, huffman_decompress, huffman_pack,
+                             huffman_unpack, rle_encode_bytes, rle_decode_bytes, lzss_compress, lzss_decompress,
+                             huffman_tree, build_huffman_codes, flat_huffman_tree, flat_code_lengths, canonical_words,
+                             pack_bits, flat_tree_from_words, walk_bits, build_decode_table, decode_with_table)
+from treeNode import TreeNode
+
+CORPORA = ("random", "skewed", "repetitive", "text")
+UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+CORPUS_CHUNK = 1 << 20  # Corpora are generated this many bytes at a time
+STRING_STAGES_MAX_SIZE = 16 << 20  # The str based API needs about 10x the corpus size, larger corpora skip it
+PURE_PYTHON_STAGES_MAX_SIZE = 4 << 20  # lzss and rle_bytes run at a few MB/s or less, larger corpora skip them
+STAGE_REPEATS = 5  # Stages are timed as the best of this many repeats
+DECODE_TABLE_BITS = 10  # Index bits of the lookup table decoder in the tree comparison, unpack_bits_table's default
+STAGE_MIN_TIME = 0.2  # Each repeat calls the stage enough times to last at least this many seconds
+WORDS = ("the", "of", "and", "to", "in", "is", "was", "that", "for", "it", "with", "as", "his", "on", "be",
+         "at", "by", "had", "are", "but", "from", "or", "have", "an", "they", "which", "one", "you", "were",
+         "her", "all", "she", "there", "would", "their", "we", "him", "been", "has", "when", "who", "will",
+         "compression", "block", "stream", "huffman", "server", "request", "error", "warning", "info")
+
+
+def parse_size(size: str) -> int:
+    """
+    Parses a human readable size such as '64KB', '16MB' or '1GB'.
+
+    Args:
+        size: The size to parse, a plain number is a byte count.
+
+    Returns:
+        int: The size in bytes.
+    """
+    size = size.strip().upper()
+    for unit, factor in UNITS.items():
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * factor)
+    return int(size)
+
+
+def generate_corpus(kind: str, size: int, seed: int = 0) -> bytes:
+    """
+    Generates a synthetic corpus, CORPUS_CHUNK bytes at a time so large sizes fit in memory.
+
+    Args:
+        kind: 'random' (uniform bytes), 'skewed' (geometric byte distribution),
+            'repetitive' (log lines with few distinct values) or 'text' (word-frequency weighted prose).
+        size: Number of bytes to generate.
+        seed: Random seed, so the same corpus is generated on every run.
+
+    Returns:
+        bytes: The corpus.
+    """
+    if kind not in CORPORA:
+        raise ValueError(f"Unknown corpus kind: {kind}")
+    rng = random.Random(seed)
+    corpus = BytesIO()  # getvalue() hands over the buffer without copying it
+    if kind == "random":
+        while corpus.tell() < size:
+            corpus.write(rng.randbytes(min(CORPUS_CHUNK, size - corpus.tell())))
+        return corpus.getvalue()
+    if kind == "skewed":
+        weights = [0.8 ** i for i in range(256)]
+        while corpus.tell() < size:
+            count = min(CORPUS_CHUNK, size - corpus.tell())
+            corpus.write(bytes(rng.choices(range(256), weights=weights, k=count)))
+        return corpus.getvalue()
+
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]  # Zipf-like word frequencies
+    chunk = []
+    chunk_size = 0
+    while corpus.tell() + chunk_size < size:
+        if kind == "repetitive":
+            line = (f"2024-01-{rng.randint(1, 28):02d} 12:00:{rng.randint(0, 59):02d} "
+                    f"{rng.choice(('INFO', 'INFO', 'INFO', 'WARN', 'ERROR'))} "
+                    f"worker-{rng.randint(1, 4)} processed request {rng.randint(1, 20)}\n")
+        else:
+            line = " ".join(rng.choices(WORDS, weights=weights, k=rng.randint(5, 15))).capitalize() + ".\n"
+        chunk.append(line)
+        chunk_size += len(line)
+        if chunk_size >= CORPUS_CHUNK:
+            corpus.write("".join(chunk).encode())
+            chunk = []
+            chunk_size = 0
+    corpus.write("".join(chunk).encode())
+    corpus.truncate(size)
+    return corpus.getvalue()
+
+
+def huffman_string_stages(data: bytes) -> List[Tuple[str, Callable, Callable]]:
+    """
+    Builds the timed stages of the string based RLE and Huffman API.
+
+    Args:
+        data: The corpus, decoded as latin-1 so every byte maps to one character.
+
+    Returns:
+        List[Tuple[str, Callable, Callable]]: (stage name, function to time, output size in bytes) triples.
+    """
+    text = data.decode("latin-1")
+    state = {}
+
+    def setup():
+        state["tree"], state["codes"] = huffman_setup(text)
+
+    def compress():
+        state["bits"] = huffman_compress(text, state["codes"])
+
+    return [
+        ("rle_compress", lambda: state.__setitem__("rle", rle_compress(text)), lambda: len(state["rle"])),
+        ("huffman_setup", setup, lambda: None),
+        ("huffman_compress", compress, lambda: (len(state["bits"]) + 7) // 8),
+        ("huffman_decompress", lambda: huffman_decompress(state["bits"], state["tree"]), lambda: None),
+    ]
+
+
+def codec_stages(data: bytes, pure_python: bool = True) -> List[Tuple[str, Callable, Callable]]:
+    """
+    Builds the timed compress/decompress stages of the bytes codecs.
+
+    Args:
+        data: The corpus.
+        pure_python: Whether to include the slow pure Python codecs (rle_bytes and lzss).
+
+    Returns:
+        List[Tuple[str, Callable, Callable]]: (stage name, function to time, output size in bytes) triples.
+    """
+    codecs = {
+        "huffman_pack": (huffman_pack, huffman_unpack),
+        "rle_bytes": (rle_encode_bytes, rle_decode_bytes),
+        "lzss": (lzss_compress, lzss_decompress),
+    }
+    if not pure_python:
+        codecs = {"huffman_pack": codecs["huffman_pack"]}
+    stages = []
+    state = {}
+    for name, (compress, decompress) in codecs.items():
+        stages.append((f"{name}_compress", lambda name=name, compress=compress: state.__setitem__(name, compress(data)),
+                       lambda name=name: len(state[name])))
+        stages.append((f"{name}_decompress", lambda name=name, decompress=decompress: decompress(state[name]),
+                       lambda: None))
+    return stages
+
+
+def run_stage(function: Callable, measure_memory: bool, repeats: int = STAGE_REPEATS,
+              min_time: float = STAGE_MIN_TIME) -> Tuple[float, int]:
+    """
+    Times a stage and optionally measures its peak traced memory in a separate run.
+
+    Like timeit, each repeat calls the stage enough times to last at least `min_time` seconds, and the
+    fastest repeat is kept, since slower ones only measure interference from the rest of the machine.
+
+    Args:
+        function: The stage to run.
+        measure_memory: Whether to run the stage again under tracemalloc.
+        repeats: Number of timed repeats.
+        min_time: Minimum duration of one repeat in seconds.
+
+    Returns:
+        Tuple[float, int]: Best seconds per call and peak allocated bytes (0 if not measured).
+    """
+    start = perf_counter()
+    function()
+    best = perf_counter() - start
+    calls = max(1, math.ceil(min_time / best)) if best else 1
+    # When a single call is long enough, the calibration call already counts as a repeat
+    for _ in range(repeats - 1 if calls == 1 else repeats):
+        start = perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, (perf_counter() - start) / calls)
+    peak = 0
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(corpora: List[str], sizes: List[int], measure_memory: bool = True,
+                   repeats: int = STAGE_REPEATS) -> List[Dict]:
+    """
+    Runs every stage on every corpus and size.
+
+    Args:
+        corpora: Corpus kinds passed to generate_corpus.
+        sizes: Corpus sizes in bytes.
+        measure_memory: Whether to record peak traced memory.
+        repeats: Number of timed repeats per stage, the fastest one is kept.
+
+    Returns:
+        List[Dict]: One record per (corpus, size, stage) with seconds, MB/s, ratio and peak memory. The str
+        based stages are skipped above STRING_STAGES_MAX_SIZE and the rle_bytes and lzss stages above
+        PURE_PYTHON_STAGES_MAX_SIZE.
+    """
+    results = []
+    for kind in corpora:
+        for size in sizes:
+            data = generate_corpus(kind, size)
+            stages = codec_stages(data, size <= PURE_PYTHON_STAGES_MAX_SIZE)
+            if size <= STRING_STAGES_MAX_SIZE:
+                stages = huffman_string_stages(data) + stages
+            for stage, function, output_size in stages:
+                elapsed, peak = run_stage(function, measure_memory, repeats)
+                compressed = output_size()
+                results.append({
+                    "corpus": kind,
+                    "size": size,
+                    "stage": stage,
+                    "seconds": elapsed,
+                    "mb_s": size / (1024 * 1024) / elapsed if elapsed else float("inf"),
+                    "ratio": compressed / size if compressed is not None and size else None,
+                    "peak_memory": peak,
+                })
+    return results
+
+
+def compare_tree_representations(alphabet_size: int, seed: int = 0, message_length: int = 100_000) -> List[Dict]:
+    """
+    Compares TreeNode objects with the array-backed tree, building a Huffman tree and its codes and
+    decoding a message over the same alphabet.
+
+    The object tree, over one character per symbol, decodes a '0'/'1' string with huffman_decompress and
+    the array-backed tree decodes packed bits with walk_bits. Alphabets of up to 256 symbols also time
+    the lookup table decoder, which emits bytes.
+
+    Args:
+        alphabet_size: Number of distinct symbols, e.g. a word-level vocabulary.
+        seed: Random seed for the Zipf-like symbol frequencies and the message.
+        message_length: Number of symbols in the decoded message.
+
+    Returns:
+        List[Dict]: One record per (stage, representation) with seconds and peak traced memory.
+    """
+    rng = random.Random(seed)
+    frequency = Counter({symbol: rng.randint(1, 1_000_000) // (symbol + 1) + 1 for symbol in range(alphabet_size)})
+    letter_frequency = {chr(symbol): count for symbol, count in frequency.items()}  # huffman_decompress joins str
+
+    def object_tree():
+        nodes = [TreeNode(count, letter, None, None) for (letter, count) in letter_frequency.items()]
+        root = huffman_tree(nodes)
+        return root, build_huffman_codes(root)
+
+    def flat_tree():
+        return flat_code_lengths(flat_huffman_tree(frequency))
+
+    message = rng.choices(list(frequency), weights=list(frequency.values()), k=message_length)
+    root, codes = object_tree()
+    bit_string = "".join(codes[chr(symbol)] for symbol in message)
+    words = canonical_words(flat_tree())
+    payload, bit_length = pack_bits(message, words)
+    tree = flat_tree_from_words(words)
+
+    def flat_decode():
+        out = []  # walk_bits only appends, a list holds symbols of any size
+        walk_bits(payload, tree, 0, bit_length, out)
+        return out
+
+    stages = [
+        ("build", "TreeNode", object_tree),
+        ("build", "FlatHuffmanTree", flat_tree),
+        ("decode", "TreeNode", lambda: huffman_decompress(bit_string, root)),
+        ("decode", "FlatHuffmanTree", flat_decode),
+    ]
+    if alphabet_size <= 256:
+        table = build_decode_table(words, DECODE_TABLE_BITS)
+        stages.append(("decode", "FlatHuffmanTree+table",
+                       lambda: decode_with_table(payload, bit_length, tree, table, DECODE_TABLE_BITS)))
+
+    results = []
+    for stage, name, function in stages:
+        elapsed, peak = run_stage(function, True)
+        results.append({"stage": stage, "tree": name, "alphabet_size": alphabet_size, "seconds": elapsed,
+                        "peak_memory": peak})
+    return results
+
+
+def compare_to_baseline(results: List[Dict], baseline: List[Dict], tolerance: float = 0.2) -> List[str]:
+    """
+    Compares benchmark results with a stored baseline.
+
+    Args:
+        results: Results of the current run.
+        baseline: Results of the baseline run.
+        tolerance: Allowed relative drop in throughput, increase in ratio or increase in peak memory.
+
+    Returns:
+        List[str]: A description of every regression (empty if there is none).
+    """
+    reference = {(record["corpus"], record["size"], record["stage"]): record for record in baseline}
+    regressions = []
+    for record in results:
+        key = (record["corpus"], record["size"], record["stage"])
+        old = reference.get(key)
+        if old is None:
+            continue
+        name = f"{record['stage']} on {record['corpus']} ({record['size']} bytes)"
+        if record["mb_s"] < old["mb_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {old['mb_s']:.2f} -> {record['mb_s']:.2f} MB/s")
+        if (record["ratio"] is not None and old["ratio"] is not None
+                and record["ratio"] > old["ratio"] * (1 + tolerance)):
+            regressions.append(f"{name}: ratio {old['ratio']:.2%} -> {record['ratio']:.2%}")
+        if old["peak_memory"] and record["peak_memory"] > old["peak_memory"] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {old['peak_memory']} -> {record['peak_memory']} bytes")
+    return regressions
+
+
+def print_results(results: List[Dict]) -> None:
+    """
+    Prints benchmark results as a table.
+
+    Args:
+        results: Results returned by run_benchmarks.
+
+    Returns:
+        None
+    """
+    print(f"{'corpus':<11}{'size':>11}  {'stage':<24}{'MB/s':>10}{'ratio':>10}{'peak MB':>10}")
+    for record in results:
+        ratio = f"{record['ratio']:.2%}" if record["ratio"] is not None else "-"
+        print(f"{record['corpus']:<11}{record['size']:>11}  {record['stage']:<24}{record['mb_s']:>10.2f}"
+              f"{ratio:>10}{record['peak_memory'] / (1024 * 1024):>10.2f}")
+
+
+def main() -> None:
+    """
+    Runs the compression benchmarks and checks them against a JSON baseline.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the dataCompression codecs")
+    parser.add_argument("--corpora", nargs="+", default=list(CORPORA), choices=CORPORA)
+    parser.add_argument("--sizes", nargs="+", default=["16KB", "64KB"],
+                        help="e.g. 64KB 16MB 1GB, the str based stages only run up to 16MB and the "
+                             "rle_bytes and lzss stages up to 4MB")
+    parser.add_argument("--repeats", type=int, default=STAGE_REPEATS, help="Timed repeats per stage, the best is kept")
+    parser.add_argument("--baseline", default="compression_baseline.json", help="JSON baseline file")
+    parser.add_argument("--update", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak memory run")
+    parser.add_argument("--trees", type=int, metavar="ALPHABET_SIZE",
+                        help="Only compare building and decoding with the object and array-backed Huffman trees")
+    args = parser.parse_args()
+
+    if args.trees:
+        for record in compare_tree_representations(args.trees):
+            print(f"{record['stage']:<7} {record['tree']:<22} {record['seconds']:.4f} s  "
+                  f"{record['peak_memory'] / (1024 * 1024):.2f} MB")
+        return
+
+    results = run_benchmarks(args.corpora, [parse_size(size) for size in args.sizes], not args.no_memory,
+                             args.repeats)
+    print_results(results)
+
+    if args.update:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print(f"\nNo baseline at {args.baseline}, run with --update to create one")
+        return
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION:", regression)
+    if regressions:
+        sys.exit(1)
+    print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,27 @@
 from treeNode import TreeNode
 from collections import Counter
 from heapq import heapify, heappop, heappush
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Iterable, Iterator, BinaryIO, Optional
+from time import perf_counter
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import struct
+import os
+from bisect import bisect_right
+from array import array
+import re
+import zlib
+import hashlib
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, run detection falls back to a regular expression scan
+    np = None
+
+RUN_PATTERN = re.compile(rb"(.)\1*", re.DOTALL)
+NUMPY_RUN_THRESHOLD = 1 << 16  # Inputs at least this large use the vectorized run detection
 
 
 def rle_compress(text: str) -> str:
@@ -47,6 +67,75 @@ def rle_decompression(text: str) -> str:
     return result
 
 
+def find_runs(data: bytes, use_numpy: Optional[bool] = None) -> Tuple[list, list]:
+    """
+    Finds the runs of repeated bytes in a buffer.
+
+    Args:
+        data: The bytes to scan.
+        use_numpy: Force (True) or disable (False) the NumPy diff/nonzero path,
+            by default it is used for large inputs when NumPy is installed.
+
+    Returns:
+        Tuple[list, list]: The byte value and the length of every run.
+
+    Raises:
+        ImportError: If `use_numpy` is True and NumPy is not installed.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None and len(data) >= NUMPY_RUN_THRESHOLD
+    elif use_numpy and np is None:
+        raise ImportError("find_runs(use_numpy=True) requires NumPy, install it or pass use_numpy=None")
+    if use_numpy and data:
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        starts = np.concatenate(([0], np.flatnonzero(buffer[1:] != buffer[:-1]) + 1))
+        lengths = np.diff(np.append(starts, len(buffer)))
+        return buffer[starts].tolist(), lengths.tolist()
+    values = []
+    lengths = []
+    for match in RUN_PATTERN.finditer(data):
+        values.append(data[match.start()])
+        lengths.append(match.end() - match.start())
+    return values, lengths
+
+
+def rle_encode_bytes(data: bytes, use_numpy: Optional[bool] = None) -> bytes:
+    """
+    Binary-safe Run-Length Encoding (RLE) of bytes, every run is written as a varint length and the byte.
+
+    Args:
+        data: The bytes to be compressed.
+        use_numpy: Passed to find_runs.
+
+    Returns:
+        bytes: The compressed bytes.
+    """
+    out = bytearray()
+    for value, length in zip(*find_runs(data, use_numpy)):
+        write_varint(out, length)
+        out.append(value)
+    return bytes(out)
+
+
+def rle_decode_bytes(data: bytes) -> bytes:
+    """
+    Decodes bytes produced by rle_encode_bytes.
+
+    Args:
+        data: The compressed bytes.
+
+    Returns:
+        bytes: The decompressed original bytes.
+    """
+    out = bytearray()
+    offset = 0
+    while offset < len(data):
+        length, offset = read_varint(data, offset)
+        out += data[offset:offset + 1] * length
+        offset += 1
+    return bytes(out)
+
+
 def huffman_tree(nodes: list) -> TreeNode:
     """
     Constructs a Huffman tree from a list of tree nodes.
@@ -132,7 +221,7 @@ def huffman_decompress(compressed_text: str, huffman_tree: TreeNode) -> str:
     Returns:
         str: The decompressed original text.
     """
-    result = ""
+    result = []
     current_node = huffman_tree
     for bit in compressed_text:
         if bit == "0":
@@ -141,9 +230,876 @@ def huffman_decompress(compressed_text: str, huffman_tree: TreeNode) -> str:
             current_node = current_node.right
 
         if current_node.letter is not None:
-            result += current_node.letter
+            result.append(current_node.letter)
             current_node = huffman_tree
-    return result
+    return "".join(result)
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    """
+    Appends an unsigned integer to a buffer as a little-endian base-128 varint.
+
+    Args:
+        out: Buffer to append to.
+        value: Non-negative integer to write.
+
+    Returns:
+        None
+    """
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(buffer: bytes, offset: int) -> Tuple[int, int]:
+    """
+    Reads an unsigned base-128 varint from a buffer.
+
+    Args:
+        buffer: The buffer to read from.
+        offset: Position of the first varint byte.
+
+    Returns:
+        Tuple[int, int]: The decoded value and the position after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def canonical_words(lengths: Dict[str, int]) -> Dict[str, Tuple[int, int]]:
+    """
+    Assigns canonical Huffman code words from code lengths.
+
+    Symbols are ordered by (code length, symbol) and receive consecutive code values, so the
+    lengths alone are enough to rebuild identical encode and decode tables.
+
+    Args:
+        lengths: Dictionary mapping symbols to code lengths.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Dictionary mapping symbols to (code value, code length) pairs.
+    """
+    words = {}
+    value = 0
+    previous_length = 0
+    for symbol, length in sorted(lengths.items(), key=lambda item: (item[1], item[0])):
+        value <<= length - previous_length
+        words[symbol] = (value, length)
+        value += 1
+        previous_length = length
+    return words
+
+
+def serialize_code_lengths(lengths: Dict[int, int]) -> bytes:
+    """
+    Serializes code lengths as a symbol count followed by (symbol delta, length) pairs.
+
+    Args:
+        lengths: Dictionary mapping integer symbols to code lengths.
+
+    Returns:
+        bytes: The serialized code lengths.
+    """
+    out = bytearray()
+    write_varint(out, len(lengths))
+    previous = -1
+    for symbol in sorted(lengths):
+        write_varint(out, symbol - previous - 1)
+        out.append(lengths[symbol])
+        previous = symbol
+    return bytes(out)
+
+
+def deserialize_code_lengths(buffer: bytes, offset: int = 0) -> Tuple[Dict[int, int], int]:
+    """
+    Reads code lengths written by serialize_code_lengths.
+
+    Args:
+        buffer: The buffer to read from.
+        offset: Position of the serialized code lengths.
+
+    Returns:
+        Tuple[Dict[int, int], int]: Dictionary mapping symbols to code lengths and the position after it.
+    """
+    count, offset = read_varint(buffer, offset)
+    lengths = {}
+    symbol = -1
+    for _ in range(count):
+        delta, offset = read_varint(buffer, offset)
+        symbol += delta + 1
+        lengths[symbol] = buffer[offset]
+        offset += 1
+    return lengths, offset
+
+
+def pack_bits(symbols: Iterable, words: Dict[str, Tuple[int, int]]) -> Tuple[bytearray, int]:
+    """
+    Packs the code words of a sequence of symbols into a byte buffer, most significant bit first.
+
+    Args:
+        symbols: The symbols to encode.
+        words: Dictionary mapping symbols to (code value, code length) pairs.
+
+    Returns:
+        Tuple[bytearray, int]: The packed bytes (zero padded to a byte boundary) and the number of valid bits.
+    """
+    out = bytearray()
+    acc = 0
+    acc_bits = 0
+    total_bits = 0
+    for symbol in symbols:
+        value, length = words[symbol]
+        acc = (acc << length) | value
+        acc_bits += length
+        total_bits += length
+        while acc_bits >= 8:
+            acc_bits -= 8
+            out.append((acc >> acc_bits) & 0xFF)
+        acc &= (1 << acc_bits) - 1
+    if acc_bits:
+        out.append((acc << (8 - acc_bits)) & 0xFF)
+    return out, total_bits
+
+
+class FlatHuffmanTree:
+    """
+    Huffman tree over integer symbols stored as parallel arrays instead of one object per node.
+
+    Node `i` has children `left[i]` and `right[i]` (-1 when absent), frequency `counts[i]`
+    and symbol `symbols[i]` (-1 for internal nodes).
+    """
+    __slots__ = ("left", "right", "counts", "symbols", "root")
+
+    def __init__(self):
+        self.left = array("i")
+        self.right = array("i")
+        self.counts = array("q")
+        self.symbols = array("i")
+        self.root = -1
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def add(self, count: int, symbol: int = -1, left: int = -1, right: int = -1) -> int:
+        self.left.append(left)
+        self.right.append(right)
+        self.counts.append(count)
+        self.symbols.append(symbol)
+        return len(self.symbols) - 1
+
+
+def flat_huffman_tree(frequency: Dict[int, int]) -> FlatHuffmanTree:
+    """
+    Constructs an array-backed Huffman tree from symbol frequencies.
+
+    Args:
+        frequency: Dictionary mapping integer symbols to their counts.
+
+    Returns:
+        FlatHuffmanTree: The Huffman tree, parents are always stored after their children.
+    """
+    tree = FlatHuffmanTree()
+    heap = [(count, tree.add(count, symbol)) for symbol, count in frequency.items()]
+    heapify(heap)
+    while len(heap) > 1:
+        left_count, left = heappop(heap)
+        right_count, right = heappop(heap)
+        heappush(heap, (left_count + right_count, tree.add(left_count + right_count, -1, left, right)))
+    if heap:
+        tree.root = heap[0][1]
+    return tree
+
+
+def flat_code_lengths(tree: FlatHuffmanTree) -> Dict[int, int]:
+    """
+    Computes the code length of every symbol of an array-backed Huffman tree.
+
+    Args:
+        tree: Tree built by flat_huffman_tree.
+
+    Returns:
+        Dict[int, int]: Dictionary mapping symbols to code lengths.
+    """
+    if tree.root < 0:
+        return {}
+    left, right, symbols = tree.left, tree.right, tree.symbols
+    depth = array("i", bytes(4 * len(tree)))
+    lengths = {}
+    # Parents come after their children, so walking down from the root visits every parent first
+    for node in range(tree.root, -1, -1):
+        if symbols[node] >= 0:
+            # A single-symbol alphabet has depth 0, give it one bit so it can be written
+            lengths[symbols[node]] = depth[node] or 1
+        else:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+    return lengths
+
+
+def flat_tree_from_words(words: Dict[int, Tuple[int, int]]) -> FlatHuffmanTree:
+    """
+    Rebuilds an array-backed Huffman tree from integer code words.
+
+    Args:
+        words: Dictionary mapping symbols to (code value, code length) pairs.
+
+    Returns:
+        FlatHuffmanTree: The decoding tree (counts are not preserved).
+    """
+    tree = FlatHuffmanTree()
+    tree.root = tree.add(0)
+    left, right = tree.left, tree.right
+    for symbol, (value, length) in words.items():
+        node = tree.root
+        for shift in range(length - 1, -1, -1):
+            children = right if (value >> shift) & 1 else left
+            if children[node] < 0:
+                children[node] = tree.add(0)
+            node = children[node]
+        tree.symbols[node] = symbol
+    return tree
+
+
+def walk_bits(payload: bytes, tree: FlatHuffmanTree, start: int, stop: int, out: bytearray,
+              max_symbols: int = -1) -> int:
+    """
+    Decodes symbols by walking the Huffman tree one bit at a time.
+
+    Args:
+        payload: The packed bytes.
+        tree: The Huffman tree used for decoding.
+        start: Bit position to start decoding at.
+        stop: Bit position to stop decoding at.
+        out: Buffer the decoded symbols are appended to.
+        max_symbols: Stop after this many symbols (-1 for no limit).
+
+    Returns:
+        int: The bit position after the last decoded symbol.
+    """
+    left, right, symbols, root = tree.left, tree.right, tree.symbols, tree.root
+    node = root
+    position = start
+    for i in range(start, stop):
+        if (payload[i >> 3] >> (7 - (i & 7))) & 1:
+            node = right[node]
+        else:
+            node = left[node]
+        if node < 0:
+            break  # Padding bits of a single-symbol stream
+        if symbols[node] >= 0:
+            out.append(symbols[node])
+            node = root
+            position = i + 1
+            max_symbols -= 1
+            if max_symbols == 0:
+                break
+    return position
+
+
+def unpack_bits_tree(payload: bytes, bit_length: int, words: Dict[str, Tuple[int, int]]) -> bytearray:
+    """
+    Decodes a packed bitstream one bit at a time by walking the Huffman tree.
+
+    Args:
+        payload: The packed bytes.
+        bit_length: Number of valid bits in the payload.
+        words: Dictionary mapping symbols to (code value, code length) pairs.
+
+    Returns:
+        bytearray: The decoded symbols.
+    """
+    out = bytearray()
+    walk_bits(payload, flat_tree_from_words(words), 0, bit_length, out)
+    return out
+
+
+def build_single_table(words: Dict[str, Tuple[int, int]], table_bits: int) -> list:
+    """
+    Precomputes a single-symbol lookup table indexed by the next `table_bits` bits of the stream.
+
+    Args:
+        words: Dictionary mapping symbols to (code value, code length) pairs.
+        table_bits: Number of bits used to index the table.
+
+    Returns:
+        list: 2 ** table_bits entries of (symbol, code length), the length is 0 for codes longer than the index.
+    """
+    single = [(0, 0)] * (1 << table_bits)
+    for symbol, (value, length) in words.items():
+        if length <= table_bits:
+            base = value << (table_bits - length)
+            for index in range(base, base + (1 << (table_bits - length))):
+                single[index] = (symbol, length)
+    return single
+
+
+def build_decode_table(words: Dict[str, Tuple[int, int]], table_bits: int) -> list:
+    """
+    Precomputes a multi-symbol lookup table indexed by the next `table_bits` bits of the stream.
+
+    Each entry holds every symbol that can be fully decoded from those bits and the number of bits
+    they consume. Entries whose first code is longer than `table_bits` consume 0 bits and are
+    decoded by walking the tree instead.
+
+    Args:
+        words: Dictionary mapping symbols to (code value, code length) pairs.
+        table_bits: Number of bits used to index the table.
+
+    Returns:
+        list: 2 ** table_bits entries of (decoded symbols, bits consumed).
+    """
+    mask = (1 << table_bits) - 1
+    single = build_single_table(words, table_bits)
+    table = []
+    for index in range(1 << table_bits):
+        symbols = bytearray()
+        consumed = 0
+        while True:
+            symbol, length = single[(index << consumed) & mask]
+            if not length or consumed + length > table_bits:
+                break
+            symbols.append(symbol)
+            consumed += length
+        table.append((bytes(symbols), consumed))
+    return table
+
+
+def unpack_bits_table(payload: bytes, bit_length: int, words: Dict[str, Tuple[int, int]],
+                      table_bits: int = 10) -> bytearray:
+    """
+    Decodes a packed bitstream using a multi-symbol lookup table, emitting one or more symbols per lookup.
+
+    Args:
+        payload: The packed bytes.
+        bit_length: Number of valid bits in the payload.
+        words: Dictionary mapping symbols to (code value, code length) pairs.
+        table_bits: Number of bits used to index the lookup table.
+
+    Returns:
+        bytearray: The decoded symbols.
+    """
+    return decode_with_table(payload, bit_length, flat_tree_from_words(words),
+                             build_decode_table(words, table_bits), table_bits)
+
+
+def decode_with_table(payload: bytes, bit_length: int, tree: FlatHuffmanTree, table: list,
+                      table_bits: int) -> bytearray:
+    """
+    Decodes a packed bitstream with a prebuilt multi-symbol lookup table.
+
+    Args:
+        payload: The packed bytes.
+        bit_length: Number of valid bits in the payload.
+        tree: The Huffman tree, used for codes longer than the table index.
+        table: Lookup table built by build_decode_table.
+        table_bits: Number of bits used to index the lookup table.
+
+    Returns:
+        bytearray: The decoded symbols.
+    """
+    mask = (1 << table_bits) - 1
+    out = bytearray()
+    acc = 0
+    acc_bits = 0
+    byte_position = 0
+    position = 0
+    limit = bit_length - table_bits
+    while position <= limit:
+        while acc_bits < table_bits:
+            acc = (acc << 8) | payload[byte_position]
+            byte_position += 1
+            acc_bits += 8
+        symbols, consumed = table[(acc >> (acc_bits - table_bits)) & mask]
+        if consumed:
+            out += symbols
+            position += consumed
+            acc_bits -= consumed
+            acc &= (1 << acc_bits) - 1
+        else:
+            # Code longer than the table index, decode it bit by bit and resynchronise the accumulator
+            position = walk_bits(payload, tree, position, bit_length, out, 1)
+            byte_position = position >> 3
+            acc_bits = 0
+            acc = 0
+            if position & 7:
+                acc_bits = 8 - (position & 7)
+                acc = payload[byte_position] & ((1 << acc_bits) - 1)
+                byte_position += 1
+    walk_bits(payload, tree, position, bit_length, out)
+    return out
+
+
+HUFFMAN_DECODERS = {
+    "tree": unpack_bits_tree,
+    "table": unpack_bits_table,
+}
+
+
+def huffman_pack(data: bytes) -> bytes:
+    """
+    Compresses bytes into a packed Huffman bitstream with a self-describing header.
+
+    The header holds the payload bit length and the canonical code lengths, so the result can be
+    written to disk or sent over the wire and decoded with huffman_unpack.
+
+    Args:
+        data: The bytes to be compressed.
+
+    Returns:
+        bytes: Header followed by the packed bitstream.
+    """
+    if not data:
+        return bytes(2)  # Zero bits, zero symbols
+    lengths = flat_code_lengths(flat_huffman_tree(Counter(data)))
+    payload, bit_length = pack_bits(data, canonical_words(lengths))
+    header = bytearray()
+    write_varint(header, bit_length)
+    header += serialize_code_lengths(lengths)
+    return bytes(header + payload)
+
+
+def huffman_unpack(packed: bytes, decoder: str = "table") -> bytes:
+    """
+    Decompresses a packed Huffman bitstream produced by huffman_pack.
+
+    Args:
+        packed: Header followed by the packed bitstream.
+        decoder: Decoding strategy, 'table' (multi-symbol lookup) or 'tree' (bit by bit tree walk).
+
+    Returns:
+        bytes: The decompressed original bytes.
+    """
+    bit_length, offset = read_varint(packed, 0)
+    lengths, offset = deserialize_code_lengths(packed, offset)
+    return bytes(HUFFMAN_DECODERS[decoder](packed[offset:], bit_length, canonical_words(lengths)))
+
+
+MODEL_FRAME = struct.Struct(">I")  # id of the model a frame was compressed with
+MODEL_REGISTRY: Dict[int, bytes] = {}  # model id: serialized code lengths
+MODEL_TABLE_BITS = 10
+
+
+class HuffmanModel:
+    """
+    Shared Huffman code trained on a sample corpus, reusable across many small payloads.
+    """
+
+    def __init__(self, lengths: Dict[int, int]):
+        self.lengths = lengths
+        self.serialized = serialize_code_lengths(lengths)
+        self.model_id = int.from_bytes(hashlib.sha256(self.serialized).digest()[:MODEL_FRAME.size], "big")
+
+    @classmethod
+    def train(cls, samples: Iterable[bytes]) -> "HuffmanModel":
+        """
+        Trains a model on sample payloads. Every byte value gets a code, so any payload can be encoded.
+
+        Args:
+            samples: Representative payloads.
+
+        Returns:
+            HuffmanModel: The trained model.
+        """
+        frequency = Counter(range(256))  # Add-one smoothing
+        for sample in samples:
+            frequency.update(sample)
+        return cls(flat_code_lengths(flat_huffman_tree(frequency)))
+
+    def save(self, filename: str) -> None:
+        """
+        Saves the model as its serialized code lengths.
+
+        Args:
+            filename: The name of the file to write.
+
+        Returns:
+            None
+        """
+        with open(filename, "wb") as file:
+            file.write(self.serialized)
+
+    @classmethod
+    def load(cls, filename: str) -> "HuffmanModel":
+        """
+        Loads a model written by save.
+
+        Args:
+            filename: The name of the file to read.
+
+        Returns:
+            HuffmanModel: The loaded model, with the same model id as the saved one.
+        """
+        with open(filename, "rb") as file:
+            return cls(deserialize_code_lengths(file.read())[0])
+
+
+def register_model(model: HuffmanModel) -> int:
+    """
+    Registers a model so frames referencing its id can be decompressed.
+
+    Args:
+        model: The model to register.
+
+    Returns:
+        int: The model id.
+    """
+    MODEL_REGISTRY[model.model_id] = model.serialized
+    return model.model_id
+
+
+@lru_cache(maxsize=32)
+def compile_model(serialized: bytes) -> Tuple[Dict[int, Tuple[int, int]], FlatHuffmanTree, list]:
+    """
+    Builds (and caches) the encode and decode tables of a model.
+
+    Args:
+        serialized: The serialized code lengths of the model.
+
+    Returns:
+        Tuple[Dict[int, Tuple[int, int]], FlatHuffmanTree, list]: The code words, the decoding tree
+            and the lookup table.
+    """
+    words = canonical_words(deserialize_code_lengths(serialized)[0])
+    return words, flat_tree_from_words(words), build_decode_table(words, MODEL_TABLE_BITS)
+
+
+def model_compress(data: bytes, model: HuffmanModel) -> bytes:
+    """
+    Compresses a payload with a shared model, the frame only carries the model id and the bit length.
+
+    Args:
+        data: The bytes to be compressed.
+        model: The model to encode with.
+
+    Returns:
+        bytes: The compressed frame.
+    """
+    words, _, _ = compile_model(model.serialized)
+    payload, bit_length = pack_bits(data, words)
+    frame = bytearray(MODEL_FRAME.pack(model.model_id))
+    write_varint(frame, bit_length)
+    return bytes(frame + payload)
+
+
+def model_decompress(frame: bytes) -> bytes:
+    """
+    Decompresses a frame produced by model_compress, the model must have been registered.
+
+    Args:
+        frame: The compressed frame.
+
+    Returns:
+        bytes: The decompressed original bytes.
+    """
+    (model_id,) = MODEL_FRAME.unpack_from(frame)
+    serialized = MODEL_REGISTRY.get(model_id)
+    if serialized is None:
+        raise KeyError(f"Unknown Huffman model {model_id:#010x}")
+    _, tree, table = compile_model(serialized)
+    bit_length, offset = read_varint(frame, MODEL_FRAME.size)
+    return bytes(decode_with_table(frame[offset:], bit_length, tree, table, MODEL_TABLE_BITS))
+
+
+def decoder_throughput(packed: bytes, decoder: str, repeat: int = 3) -> float:
+    """
+    Measures the decompression throughput of a Huffman decoder.
+
+    Args:
+        packed: Header followed by the packed bitstream.
+        decoder: Decoding strategy passed to huffman_unpack.
+        repeat: Number of runs, the fastest one is reported.
+
+    Returns:
+        float: Throughput in MB/s of decompressed output.
+    """
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = perf_counter()
+        size = len(huffman_unpack(packed, decoder))
+        best = min(best, perf_counter() - start)
+    return size / (1024 * 1024) / best if best else float("inf")
+
+
+MIN_MATCH = 3
+MAX_MATCH = 258
+LZ_CHAIN_LENGTHS = {1: 4, 2: 8, 3: 16, 4: 32, 5: 64, 6: 128, 7: 256, 8: 1024, 9: 4096}  # Effort level: chain length
+LZ_TABLE_BITS = 10
+LZ_HASH_BITS = 15  # Size of the hash table of chain heads, like zlib's default hash_bits
+LZ_HASH_SHIFT = 5  # Each of the MIN_MATCH prefix bytes is shifted this much further, so all of them reach the hash
+
+
+class BitWriter:
+    """
+    Accumulates variable-length bit fields into bytes, most significant bit first.
+    """
+
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.acc_bits = 0
+
+    def write(self, value: int, length: int) -> None:
+        self.acc = (self.acc << length) | value
+        self.acc_bits += length
+        while self.acc_bits >= 8:
+            self.acc_bits -= 8
+            self.out.append((self.acc >> self.acc_bits) & 0xFF)
+        self.acc &= (1 << self.acc_bits) - 1
+
+    def getvalue(self) -> bytes:
+        if self.acc_bits:
+            return bytes(self.out) + bytes(((self.acc << (8 - self.acc_bits)) & 0xFF,))
+        return bytes(self.out)
+
+
+class BitReader:
+    """
+    Reads variable-length bit fields and Huffman coded symbols from bytes, most significant bit first.
+    """
+
+    def __init__(self, data: bytes, position: int = 0):
+        self.data = bytes(data) + bytes(4)  # Padding so peeks never run past the end
+        self.position = position
+
+    def peek(self, length: int) -> int:
+        position = self.position
+        chunk = int.from_bytes(self.data[position >> 3:(position >> 3) + 4], "big")
+        return (chunk >> (32 - (position & 7) - length)) & ((1 << length) - 1)
+
+    def read(self, length: int) -> int:
+        value = self.peek(length) if length else 0
+        self.position += length
+        return value
+
+    def decode(self, table: list, tree: FlatHuffmanTree) -> int:
+        symbol, length = table[self.peek(LZ_TABLE_BITS)]
+        if length:
+            self.position += length
+            return symbol
+        node = tree.root  # Code longer than the table index
+        while tree.symbols[node] < 0:
+            node = tree.right[node] if self.read(1) else tree.left[node]
+        return tree.symbols[node]
+
+
+def lz77_tokens(data: bytes, window_bits: int = 15, level: int = 6) -> list:
+    """
+    Finds LZ77 matches with hash chains over 3-byte prefixes.
+
+    As in zlib, chain heads live in a fixed-size hash table and chain links in a window-sized ring, so
+    memory does not grow with the input. Hash collisions only cost a failed comparison.
+
+    Args:
+        data: The bytes to parse.
+        window_bits: Log2 of the sliding window size, matches reach at most this far back.
+        level: Effort level from 1 to 9, bounding how many chain candidates are compared per position.
+
+    Returns:
+        list: Literal byte values (int) and (length, distance) match tuples.
+    """
+    window = 1 << window_bits
+    window_mask = window - 1
+    hash_mask = (1 << LZ_HASH_BITS) - 1
+    max_chain = LZ_CHAIN_LENGTHS[level]
+    size = len(data)
+    head = [-1] * (1 << LZ_HASH_BITS)
+    previous = [-1] * window  # Indexed by position & window_mask
+    tokens = []
+
+    def insert(position: int) -> None:
+        key = ((data[position] << 2 * LZ_HASH_SHIFT) ^ (data[position + 1] << LZ_HASH_SHIFT)
+               ^ data[position + 2]) & hash_mask
+        previous[position & window_mask] = head[key]
+        head[key] = position
+
+    i = 0
+    while i < size:
+        best_length = 0
+        best_distance = 0
+        if i + MIN_MATCH <= size:
+            limit = min(MAX_MATCH, size - i)
+            key = ((data[i] << 2 * LZ_HASH_SHIFT) ^ (data[i + 1] << LZ_HASH_SHIFT) ^ data[i + 2]) & hash_mask
+            candidate = head[key]
+            chain = max_chain
+            while candidate >= 0 and i - candidate <= window and chain:
+                # Only extend candidates that could beat the current best
+                if data[candidate + best_length] == data[i + best_length]:
+                    length = 0
+                    while length < limit and data[candidate + length] == data[i + length]:
+                        length += 1
+                    if length > best_length:
+                        best_length = length
+                        best_distance = i - candidate
+                        if length == limit:
+                            break
+                candidate = previous[candidate & window_mask]
+                chain -= 1
+            # Chain the current position now, reusing its hash
+            previous[i & window_mask] = head[key]
+            head[key] = i
+        if best_length >= MIN_MATCH:
+            tokens.append((best_length, best_distance))
+            for position in range(i + 1, min(i + best_length, size - MIN_MATCH + 1)):
+                insert(position)
+            i += best_length
+        else:
+            tokens.append(data[i])
+            i += 1
+    return tokens
+
+
+def distance_bucket(distance: int) -> Tuple[int, int, int]:
+    """
+    Splits a match distance into a Huffman coded bucket and raw extra bits.
+
+    Args:
+        distance: The match distance (at least 1).
+
+    Returns:
+        Tuple[int, int, int]: The bucket, the extra bits value and the number of extra bits.
+    """
+    offset = distance - 1
+    bucket = offset.bit_length()
+    if bucket <= 1:
+        return bucket, 0, 0
+    return bucket, offset - (1 << (bucket - 1)), bucket - 1
+
+
+def huffman_words(symbols: list) -> Tuple[Dict[int, int], Dict[int, Tuple[int, int]]]:
+    """
+    Builds canonical Huffman code lengths and code words for a list of symbols.
+
+    Args:
+        symbols: The symbols to be encoded.
+
+    Returns:
+        Tuple[Dict[int, int], Dict[int, Tuple[int, int]]]: The code lengths and the code words.
+    """
+    if not symbols:
+        return {}, {}
+    lengths = flat_code_lengths(flat_huffman_tree(Counter(symbols)))
+    return lengths, canonical_words(lengths)
+
+
+def lzss_compress(data: bytes, window_bits: int = 15, level: int = 6) -> bytes:
+    """
+    DEFLATE-style compression: LZ77 matching followed by Huffman coding of the tokens.
+
+    Literals and match lengths share one alphabet (0-255 literals, 256 + length - MIN_MATCH for lengths),
+    distances are coded as a Huffman coded bucket plus raw extra bits.
+
+    Args:
+        data: The bytes to be compressed.
+        window_bits: Log2 of the sliding window size.
+        level: Effort level from 1 to 9.
+
+    Returns:
+        bytes: Header (token count and both code length tables) followed by the packed bitstream.
+    """
+    tokens = lz77_tokens(data, window_bits, level)
+    literal_symbols = []
+    distance_symbols = []
+    for token in tokens:
+        if isinstance(token, tuple):
+            literal_symbols.append(256 + token[0] - MIN_MATCH)
+            distance_symbols.append(distance_bucket(token[1])[0])
+        else:
+            literal_symbols.append(token)
+    literal_lengths, literal_words = huffman_words(literal_symbols)
+    distance_lengths, distance_words = huffman_words(distance_symbols)
+
+    writer = BitWriter()
+    for token in tokens:
+        if isinstance(token, tuple):
+            writer.write(*literal_words[256 + token[0] - MIN_MATCH])
+            bucket, extra, extra_bits = distance_bucket(token[1])
+            writer.write(*distance_words[bucket])
+            writer.write(extra, extra_bits)
+        else:
+            writer.write(*literal_words[token])
+
+    header = bytearray()
+    write_varint(header, len(tokens))
+    header += serialize_code_lengths(literal_lengths)
+    header += serialize_code_lengths(distance_lengths)
+    return bytes(header) + writer.getvalue()
+
+
+def lzss_decompress(packed: bytes) -> bytes:
+    """
+    Decompresses bytes produced by lzss_compress.
+
+    Args:
+        packed: Header followed by the packed bitstream.
+
+    Returns:
+        bytes: The decompressed original bytes.
+    """
+    count, offset = read_varint(packed, 0)
+    literal_lengths, offset = deserialize_code_lengths(packed, offset)
+    distance_lengths, offset = deserialize_code_lengths(packed, offset)
+    literal_words = canonical_words(literal_lengths)
+    distance_words = canonical_words(distance_lengths)
+    literal_table = build_single_table(literal_words, LZ_TABLE_BITS)
+    distance_table = build_single_table(distance_words, LZ_TABLE_BITS)
+    literal_tree = flat_tree_from_words(literal_words)
+    distance_tree = flat_tree_from_words(distance_words)
+
+    reader = BitReader(packed[offset:])
+    out = bytearray()
+    for _ in range(count):
+        symbol = reader.decode(literal_table, literal_tree)
+        if symbol < 256:
+            out.append(symbol)
+            continue
+        length = symbol - 256 + MIN_MATCH
+        bucket = reader.decode(distance_table, distance_tree)
+        distance = bucket + 1 if bucket <= 1 else (1 << (bucket - 1)) + reader.read(bucket - 1) + 1
+        start = len(out) - distance
+        if distance >= length:
+            out += out[start:start + length]
+        else:
+            # Overlapping match, repeat the last `distance` bytes
+            out += (out[start:] * (length // distance + 1))[:length]
+    return bytes(out)
+
+
+def benchmark_lzss(data: bytes, levels: Iterable[int] = (1, 6, 9)) -> list:
+    """
+    Compares the ratio and throughput of lzss_compress against zlib at the same levels.
+
+    Args:
+        data: The bytes to compress.
+        levels: Effort levels to benchmark.
+
+    Returns:
+        list: One dict per level with ratios and MB/s for both codecs.
+    """
+    megabytes = len(data) / (1024 * 1024)
+    results = []
+    for level in levels:
+        start = perf_counter()
+        packed = lzss_compress(data, level=level)
+        lzss_time = perf_counter() - start
+        start = perf_counter()
+        zlib_packed = zlib.compress(data, level)
+        zlib_time = perf_counter() - start
+        results.append({
+            'level': level,
+            'lzss_ratio': len(packed) / len(data),
+            'lzss_mb_s': megabytes / lzss_time if lzss_time else float("inf"),
+            'zlib_ratio': len(zlib_packed) / len(data),
+            'zlib_mb_s': megabytes / zlib_time if zlib_time else float("inf"),
+        })
+    return results
 
 
 def read_file(filename: str) -> str:
@@ -176,6 +1132,357 @@ def write_file(filename: str, content: str) -> None:
         file.write(content)
 
 
+def read_stream_varint(stream: BinaryIO) -> Optional[int]:
+    """
+    Reads an unsigned base-128 varint from a binary file object.
+
+    Args:
+        stream: The file object to read from.
+
+    Returns:
+        Optional[int]: The decoded value, or None at end of stream.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            if shift:
+                raise EOFError("Truncated varint in compressed stream")
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def compress_stream(source: BinaryIO, block_size: int = 1 << 20) -> Iterator[bytes]:
+    """
+    Compresses a binary file object block by block, keeping memory use bounded by the block size.
+
+    Every block is Huffman packed independently and yielded as a frame prefixed with its varint length.
+
+    Args:
+        source: Binary file object to read from.
+        block_size: Number of uncompressed bytes per block.
+
+    Returns:
+        Iterator[bytes]: The compressed frames.
+    """
+    while True:
+        block = source.read(block_size)
+        if not block:
+            return
+        packed = huffman_pack(block)
+        frame = bytearray()
+        write_varint(frame, len(packed))
+        frame += packed
+        yield bytes(frame)
+
+
+def decompress_stream(source: BinaryIO, decoder: str = "table") -> Iterator[bytes]:
+    """
+    Decompresses frames written by compress_stream, one block at a time.
+
+    Args:
+        source: Binary file object to read from.
+        decoder: Decoding strategy passed to huffman_unpack.
+
+    Returns:
+        Iterator[bytes]: The decompressed blocks.
+    """
+    while True:
+        size = read_stream_varint(source)
+        if size is None:
+            return
+        packed = source.read(size)
+        if len(packed) != size:
+            raise EOFError("Truncated frame in compressed stream")
+        yield huffman_unpack(packed, decoder)
+
+
+def compress_file(source_name: str, target_name: str, block_size: int = 1 << 20) -> None:
+    """
+    Compresses a file with compress_stream.
+
+    Args:
+        source_name: The name of the file to compress.
+        target_name: The name of the compressed file to write.
+        block_size: Number of uncompressed bytes per block.
+
+    Returns:
+        None
+    """
+    with open(source_name, "rb") as source, open(target_name, "wb") as target:
+        for frame in compress_stream(source, block_size):
+            target.write(frame)
+
+
+def decompress_file(source_name: str, target_name: str) -> None:
+    """
+    Decompresses a file written by compress_file.
+
+    Args:
+        source_name: The name of the compressed file.
+        target_name: The name of the decompressed file to write.
+
+    Returns:
+        None
+    """
+    with open(source_name, "rb") as source, open(target_name, "wb") as target:
+        for block in decompress_stream(source):
+            target.write(block)
+
+
+CONTAINER_MAGIC = b"HUFC"
+INDEX_ENTRY = struct.Struct(">QQ")  # uncompressed offset, compressed offset
+FOOTER = struct.Struct(">Q4s")  # number of blocks, magic
+BLOCKS_IN_FLIGHT_PER_WORKER = 4  # Queued blocks per worker, so no worker idles behind a slow block
+
+
+def split_blocks(data: bytes, block_size: int) -> list:
+    """
+    Splits bytes into consecutive blocks of at most `block_size` bytes.
+
+    Args:
+        data: The bytes to split.
+        block_size: Maximum number of bytes per block.
+
+    Returns:
+        list: The blocks.
+    """
+    return [data[i:i + block_size] for i in range(0, len(data), block_size)]
+
+
+def block_executor(workers: Optional[int]) -> Optional[ProcessPoolExecutor]:
+    """
+    Creates the process pool shared by all blocks of a container.
+
+    Args:
+        workers: Number of worker processes (None for the number of CPUs, 1 to stay in process).
+
+    Returns:
+        Optional[ProcessPoolExecutor]: The pool, or None when the blocks are processed in process.
+    """
+    return None if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+
+
+def map_blocks(function, blocks: Iterable[bytes], executor: Optional[ProcessPoolExecutor],
+               workers: Optional[int]) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Applies a function to every block, keeping a bounded window of blocks in flight on the executor.
+
+    A new block is submitted as soon as the oldest one is collected, so workers keep running while
+    results are consumed in order, and only the window of blocks is held in memory.
+
+    Args:
+        function: Module-level function to apply (it must be picklable).
+        blocks: The blocks to process, read lazily.
+        executor: Pool from block_executor, None to process in process.
+        workers: Number of worker processes of the pool (None for the number of CPUs), sizes the window.
+
+    Returns:
+        Iterator[Tuple[bytes, bytes]]: (block, result) pairs, in block order.
+    """
+    if executor is None:
+        for block in blocks:
+            yield block, function(block)
+        return
+    window = (workers or os.cpu_count() or 1) * BLOCKS_IN_FLIGHT_PER_WORKER
+    pending = deque()
+    try:
+        for block in blocks:
+            pending.append((block, executor.submit(function, block)))
+            if len(pending) >= window:
+                block, future = pending.popleft()
+                yield block, future.result()
+        while pending:
+            block, future = pending.popleft()
+            yield block, future.result()
+    finally:
+        for _, future in pending:  # Left over when the consumer stops early or a block failed
+            future.cancel()
+
+
+def write_index(target: BinaryIO, uncompressed_offsets: list, compressed_offsets: list) -> None:
+    """
+    Writes the block index and footer of a container.
+
+    Both offset lists hold the start of every block followed by the end of the last one, compressed
+    offsets are relative to the start of the container.
+
+    Args:
+        target: Binary file object positioned after the last block.
+        uncompressed_offsets: Uncompressed start offset of every block, plus the total size.
+        compressed_offsets: Compressed start offset of every block, plus the end of the last block.
+
+    Returns:
+        None
+    """
+    for uncompressed, compressed in zip(uncompressed_offsets, compressed_offsets):
+        target.write(INDEX_ENTRY.pack(uncompressed, compressed))
+    target.write(FOOTER.pack(len(uncompressed_offsets) - 1, CONTAINER_MAGIC))
+
+
+def read_index(source: BinaryIO) -> Tuple[list, list]:
+    """
+    Reads the block index from the footer of a container.
+
+    Args:
+        source: Seekable binary file object of the container.
+
+    Returns:
+        Tuple[list, list]: The uncompressed and compressed offsets, as passed to write_index.
+    """
+    source.seek(-FOOTER.size, 2)
+    count, magic = FOOTER.unpack(source.read(FOOTER.size))
+    if magic != CONTAINER_MAGIC:
+        raise ValueError("Not a compressed container")
+    source.seek(-FOOTER.size - (count + 1) * INDEX_ENTRY.size, 2)
+    index = source.read((count + 1) * INDEX_ENTRY.size)
+    entries = list(INDEX_ENTRY.iter_unpack(index))
+    return [entry[0] for entry in entries], [entry[1] for entry in entries]
+
+
+def write_container(target: BinaryIO, blocks: Iterable[bytes], workers: Optional[int]) -> None:
+    """
+    Compresses blocks on a process pool and writes a container.
+
+    The container is the magic bytes, the Huffman packed blocks (each carrying its own code lengths),
+    then a footer index mapping the uncompressed offset of every block to its compressed offset.
+
+    Args:
+        target: Binary file object to write to.
+        blocks: The uncompressed blocks.
+        workers: Number of worker processes (None for the number of CPUs).
+
+    Returns:
+        None
+    """
+    target.write(CONTAINER_MAGIC)
+    uncompressed_offsets = [0]
+    compressed_offsets = [len(CONTAINER_MAGIC)]
+    executor = block_executor(workers)
+    try:
+        for uncompressed, packed in map_blocks(huffman_pack, blocks, executor, workers):
+            target.write(packed)
+            uncompressed_offsets.append(uncompressed_offsets[-1] + len(uncompressed))
+            compressed_offsets.append(compressed_offsets[-1] + len(packed))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    write_index(target, uncompressed_offsets, compressed_offsets)
+
+
+def compress_parallel(data: bytes, block_size: int = 1 << 20, workers: Optional[int] = None) -> bytes:
+    """
+    Compresses bytes as independent blocks on a process pool into a seekable container.
+
+    Args:
+        data: The bytes to compress.
+        block_size: Number of uncompressed bytes per block.
+        workers: Number of worker processes (None for the number of CPUs).
+
+    Returns:
+        bytes: The compressed container.
+    """
+    target = BytesIO()
+    write_container(target, split_blocks(data, block_size), workers)
+    return target.getvalue()
+
+
+def decompress_parallel(container: bytes, workers: Optional[int] = None) -> bytes:
+    """
+    Decompresses a container written by compress_parallel, decoding the blocks on a process pool.
+
+    Args:
+        container: The compressed container.
+        workers: Number of worker processes (None for the number of CPUs).
+
+    Returns:
+        bytes: The decompressed original bytes.
+    """
+    _, offsets = read_index(BytesIO(container))
+    blocks = (container[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1))
+    executor = block_executor(1 if len(offsets) < 3 else workers)  # A single block is not worth a pool
+    try:
+        return b"".join(data for _, data in map_blocks(huffman_unpack, blocks, executor, workers))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def compress_file_seekable(source_name: str, target_name: str, block_size: int = 1 << 20,
+                           workers: Optional[int] = None) -> None:
+    """
+    Compresses a file into a seekable container without loading it into memory.
+
+    Args:
+        source_name: The name of the file to compress.
+        target_name: The name of the container file to write.
+        block_size: Number of uncompressed bytes per block.
+        workers: Number of worker processes (None for the number of CPUs).
+
+    Returns:
+        None
+    """
+    with open(source_name, "rb") as source, open(target_name, "wb") as target:
+        blocks = iter(lambda: source.read(block_size), b"")
+        write_container(target, blocks, workers)
+
+
+class SeekableReader:
+    """
+    Random access reader over a container, decoding only the blocks a read touches.
+    """
+
+    def __init__(self, source: BinaryIO):
+        self.source = source
+        self.uncompressed_offsets, self.compressed_offsets = read_index(source)
+
+    def __len__(self) -> int:
+        return self.uncompressed_offsets[-1]
+
+    def read_block(self, index: int) -> bytes:
+        """
+        Decodes a single block.
+
+        Args:
+            index: Index of the block.
+
+        Returns:
+            bytes: The decompressed block.
+        """
+        start = self.compressed_offsets[index]
+        self.source.seek(start)
+        return huffman_unpack(self.source.read(self.compressed_offsets[index + 1] - start))
+
+    def read_range(self, offset: int, length: int) -> bytes:
+        """
+        Reads `length` uncompressed bytes starting at `offset`.
+
+        Args:
+            offset: Uncompressed offset to start reading at.
+            length: Number of bytes to read (fewer are returned past the end of the data).
+
+        Returns:
+            bytes: The requested slice of the original data.
+
+        Raises:
+            ValueError: If `offset` or `length` is negative.
+        """
+        if offset < 0 or length < 0:
+            raise ValueError(f"Offset and length must not be negative, got {offset} and {length}")
+        end = min(offset + length, len(self))
+        if offset >= end:
+            return b""
+        first = bisect_right(self.uncompressed_offsets, offset) - 1
+        last = bisect_right(self.uncompressed_offsets, end - 1) - 1
+        data = b"".join(self.read_block(index) for index in range(first, last + 1))
+        skip = offset - self.uncompressed_offsets[first]
+        return data[skip:skip + end - offset]
+
+
 def main() -> None:
     """
     Main function to demonstrate Run-Length Encoding (RLE) and Huffman Encoding/Decoding.
@@ -190,6 +1497,13 @@ def main() -> None:
     print("Compressed:", compressed_text)
     print("Decompressed:", decompressed_text)
 
+    # Binary-safe RLE Example
+    print("\nBinary-Safe RLE Example")
+    bitmap = bytes(1000) + b"\xff" * 300 + b"123" + bytes(5000)
+    encoded = rle_encode_bytes(bitmap)
+    print(f"Original size: {len(bitmap)} bytes, encoded size: {len(encoded)} bytes")
+    print("Round trip OK:", rle_decode_bytes(encoded) == bitmap)
+
     # Huffman Encoding/Decoding Example
     print("\nHuffman Encoding/Decoding Example")
     tree_root, codes = huffman_setup(text)
@@ -199,6 +1513,53 @@ def main() -> None:
     print("Compressed:", compressed_text)
     print("Decompressed:", decompressed_text)
 
+    # Packed Huffman bitstream Example
+    print("\nPacked Huffman Bitstream Example")
+    data = text.encode("utf-8")
+    packed = huffman_pack(data)
+    print(f"Original size: {len(data)} bytes")
+    print(f"Packed size: {len(packed)} bytes ({len(packed) / len(data):.2%})")
+    print("Round trip OK:", huffman_unpack(packed) == data)
+    for decoder in HUFFMAN_DECODERS:
+        print(f"{decoder} decoder: {decoder_throughput(packed, decoder):.2f} MB/s")
+
+    # Shared Huffman model Example
+    print("\nShared Huffman Model Example")
+    with open("sample_text.txt") as file:
+        messages = [line.encode() for line in file if line.strip()]
+    model = HuffmanModel.train(messages)
+    register_model(model)
+    frames = [model_compress(message, model) for message in messages]
+    print(f"Messages: {len(messages)}, model id: {model.model_id:#010x}")
+    print(f"Per-message packed size: {sum(len(huffman_pack(message)) for message in messages)} bytes")
+    print(f"Shared model size: {sum(map(len, frames))} bytes")
+    print("Round trip OK:", [model_decompress(frame) for frame in frames] == messages)
+
+    # LZSS + Huffman Example
+    print("\nLZSS + Huffman Example")
+    print("Round trip OK:", lzss_decompress(lzss_compress(data)) == data)
+    for result in benchmark_lzss(data):
+        print(f"Level {result['level']}: lzss {result['lzss_ratio']:.2%} at {result['lzss_mb_s']:.2f} MB/s, "
+              f"zlib {result['zlib_ratio']:.2%} at {result['zlib_mb_s']:.2f} MB/s")
+
+    # Streaming compression Example
+    print("\nStreaming Compression Example")
+    with open("sample_text.txt", "rb") as source:
+        frames = list(compress_stream(source, block_size=512))
+        source.seek(0)
+        original = source.read()
+    restored = b"".join(decompress_stream(BytesIO(b"".join(frames))))
+    print(f"Blocks: {len(frames)}, compressed size: {sum(map(len, frames))} bytes")
+    print("Round trip OK:", restored == original)
+
+    # Block-parallel compression Example
+    print("\nBlock-Parallel Compression Example")
+    container = compress_parallel(original, block_size=512)
+    print(f"Container size: {len(container)} bytes")
+    print("Round trip OK:", decompress_parallel(container) == original)
+    reader = SeekableReader(BytesIO(container))
+    print("Random access OK:", reader.read_range(1000, 100) == original[1000:1100])
+
 
 if __name__ == "__main__":
     main()
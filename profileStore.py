@@ -0,0 +1,238 @@
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from functools import lru_cache
+from statistics import mean, variance
+from typing import Dict, List
+
+
+@lru_cache(maxsize=1)
+def current_revision() -> str:
+    """
+    Returns the code revision profiled runs are tagged with.
+
+    Returns:
+        str: $PROFILE_REVISION if set, otherwise the short git commit hash, otherwise 'unknown'.
+    """
+    revision = os.environ.get("PROFILE_REVISION")
+    if revision:
+        return revision
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class ProfileRunStore:
+    """
+    Append-only JSONL store of profiled runs, one record per profiled call.
+    """
+
+    def __init__(self, path: str = "profile_runs.jsonl"):
+        self.path = path
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def format(function: str, execution_time: float, revision: str = None, **stats) -> str:
+        """
+        Formats a run as one JSON line.
+
+        Args:
+            function: Qualified name of the profiled function.
+            execution_time: Wall time of the call in seconds.
+            revision: Code revision tag, current_revision() by default.
+            **stats: Any other measurements (cpu_time, memory_usage, ...).
+
+        Returns:
+            str: The JSON record followed by a newline.
+        """
+        record = {"timestamp": time.time(), "revision": revision or current_revision(), "function": function,
+                  "execution_time": execution_time}
+        record.update(stats)
+        return json.dumps(record, default=str) + "\n"
+
+    def record(self, function: str, execution_time: float, revision: str = None, **stats) -> None:
+        line = self.format(function, execution_time, revision, **stats)
+        with self.lock, open(self.path, "a") as f:
+            f.write(line)
+
+    def load(self, revision: str = None, function: str = None) -> List[Dict]:
+        """
+        Reads the stored runs, optionally filtered.
+
+        Args:
+            revision: Only return runs of this revision.
+            function: Only return runs of this function.
+
+        Returns:
+            List[Dict]: The matching records, oldest first.
+        """
+        records = []
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if revision is not None and record["revision"] != revision:
+                        continue
+                    if function is not None and record["function"] != function:
+                        continue
+                    records.append(record)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def revisions(self) -> List[str]:
+        seen = {}
+        for record in self.load():
+            seen.setdefault(record["revision"], None)
+        return list(seen)
+
+
+def incomplete_beta(a: float, b: float, x: float) -> float:
+    """
+    Regularized incomplete beta function I_x(a, b), evaluated with a continued fraction.
+
+    Args:
+        a: First shape parameter.
+        b: Second shape parameter.
+        x: Point between 0 and 1.
+
+    Returns:
+        float: I_x(a, b).
+    """
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1 - incomplete_beta(b, a, 1 - x)  # The continued fraction converges quickly below the mean
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x)) / a
+    tiny = 1e-300
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 200):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1) < 1e-12:
+            break
+    return front * result
+
+
+def welch_t_test(baseline: List[float], candidate: List[float]) -> tuple:
+    """
+    One-sided Welch's t-test that the candidate mean is larger than the baseline mean.
+
+    Args:
+        baseline: Baseline samples (at least 2).
+        candidate: Candidate samples (at least 2).
+
+    Returns:
+        tuple: The t statistic and the one-sided p-value.
+    """
+    baseline_error = variance(baseline) / len(baseline)
+    candidate_error = variance(candidate) / len(candidate)
+    error = baseline_error + candidate_error
+    difference = mean(candidate) - mean(baseline)
+    if error == 0:
+        return (math.inf if difference > 0 else 0.0), (0.0 if difference > 0 else 1.0)
+    t = difference / math.sqrt(error)
+    freedom = error ** 2 / (baseline_error ** 2 / (len(baseline) - 1) + candidate_error ** 2 / (len(candidate) - 1))
+    tail = 0.5 * incomplete_beta(freedom / 2, 0.5, freedom / (freedom + t * t))
+    return t, tail if t > 0 else 1 - tail
+
+
+def compare_runs(store: ProfileRunStore, baseline: str, candidate: str, metric: str = "execution_time",
+                 alpha: float = 0.05, min_slowdown: float = 0.05) -> List[Dict]:
+    """
+    Compares every function profiled in two revisions.
+
+    A function is flagged as a regression when the candidate is at least `min_slowdown` slower on average
+    and Welch's t-test rejects "not slower" at significance `alpha`.
+
+    Args:
+        store: The run store.
+        baseline: Baseline revision tag.
+        candidate: Candidate revision tag.
+        metric: Record field to compare.
+        alpha: Significance level.
+        min_slowdown: Minimum relative slowdown worth flagging.
+
+    Returns:
+        List[Dict]: One comparison per function present in both revisions.
+    """
+    samples = {}
+    for revision in (baseline, candidate):
+        for record in store.load(revision=revision):
+            if record.get(metric) is not None:
+                samples.setdefault(record["function"], {}).setdefault(revision, []).append(record[metric])
+
+    comparisons = []
+    for function, by_revision in sorted(samples.items()):
+        old, new = by_revision.get(baseline, []), by_revision.get(candidate, [])
+        if not old or not new:
+            continue
+        slowdown = mean(new) / mean(old) - 1 if mean(old) else 0.0
+        t, p_value = welch_t_test(old, new) if len(old) > 1 and len(new) > 1 else (None, None)
+        comparisons.append({
+            "function": function,
+            "baseline_runs": len(old),
+            "candidate_runs": len(new),
+            "baseline_mean": mean(old),
+            "candidate_mean": mean(new),
+            "slowdown": slowdown,
+            "t": t,
+            "p_value": p_value,
+            "regression": p_value is not None and p_value < alpha and slowdown >= min_slowdown,
+        })
+    return comparisons
+
+
+def main() -> None:
+    """
+    Lists stored revisions or compares two of them, exiting with status 1 on a significant regression.
+    """
+    parser = argparse.ArgumentParser(description="Inspect and compare stored profile runs")
+    parser.add_argument("--store", default="profile_runs.jsonl", help="JSONL run store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List the stored revisions")
+    compare = commands.add_parser("compare", help="Compare two revisions")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+    compare.add_argument("--metric", default="execution_time")
+    compare.add_argument("--alpha", type=float, default=0.05)
+    compare.add_argument("--min-slowdown", type=float, default=0.05)
+    args = parser.parse_args()
+
+    store = ProfileRunStore(args.store)
+    if args.command == "list":
+        for revision in store.revisions():
+            print(f"{revision}: {len(store.load(revision=revision))} runs")
+        return
+
+    comparisons = compare_runs(store, args.baseline, args.candidate, args.metric, args.alpha, args.min_slowdown)
+    for comparison in comparisons:
+        p_value = f"{comparison['p_value']:.4f}" if comparison["p_value"] is not None else "n/a"
+        flag = "REGRESSION" if comparison["regression"] else "ok"
+        print(f"{comparison['function']}: {comparison['baseline_mean']:.6f} -> {comparison['candidate_mean']:.6f} "
+              f"({comparison['slowdown']:+.1%}, p={p_value}, runs {comparison['baseline_runs']}/"
+              f"{comparison['candidate_runs']}) {flag}")
+    if any(comparison["regression"] for comparison in comparisons):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
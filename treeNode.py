@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 class TreeNode:
+    __slots__ = ("count", "letter", "left", "right")  # No per-instance __dict__, Huffman trees allocate many nodes
+
     def __init__(self, count, letter=None, left=None, right=None):
         self.count = count  # Frequency of the letter
         self.letter = letter  # The letter (None if it's an internal node)